@@ -3,22 +3,128 @@ import os
 import sqlite3
 import random
 import re
+import mmap
+import functools
+import queue
+import time
+import threading
+from concurrent.futures import Future
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QTextEdit, QFileDialog, 
                              QSpinBox, QMessageBox, QWidget, QDialog)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+
+# Sentence pattern over raw bytes, so files can be scanned through mmap
+_SENT_RE_B = re.compile(rb'[A-Z][^.!?]*')
+
+# Shortest match that can hold the five whitespace-separated words a "What"
+# question needs (five 1-byte words plus four separators); a pure pre-check
+_MIN_SENT_LEN = 9
+
+# Questions kept per type; also bounds the de-duplication dict to 3x this size
+_MAX_PER_TYPE = 10
+
+# Private generator for quiz sampling, independent of the global random state
+_rng = random.Random()
+
+# Seconds a challenging questions result is reused before re-querying
+_CHALLENGING_TTL = 30.0
+
+# Shared SQL text, so every call site hits the same cached prepared statement
+_SQL_INSERT_Q = '''
+    INSERT INTO questions 
+    (question, source_file) VALUES (?, ?)
+    ON CONFLICT(question) DO NOTHING
+'''
+_SQL_UPDATE_STATS = '''
+    UPDATE questions 
+    SET total_attempts = total_attempts + 1,
+        correct_attempts = correct_attempts + ?
+    WHERE question = ?
+'''
+_SQL_INSERT_HISTORY = '''
+    INSERT INTO quiz_history 
+    (total_questions, correct_questions, source_file) 
+    VALUES (?, ?, ?)
+'''
+_SQL_CHALLENGING = '''
+    SELECT question FROM questions 
+    WHERE total_attempts > 0
+    ORDER BY (correct_attempts * 1.0 / total_attempts) ASC
+    LIMIT ?
+'''
 
 class TriviaQuizDatabase:
     def __init__(self, db_path='trivia_quiz.db'):
         """Initialize database for tracking quiz performance"""
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
-        self._create_tables()
+        # A single writer thread owns the connection; callers enqueue work
+        self._q = queue.Queue()
+        # (timestamp, limit, questions) of the last challenging questions query
+        self._chal_cache = (0.0, None, None)
+        ready = Future()
+        self._t = threading.Thread(target=self._loop, args=(db_path, ready), daemon=True)
+        self._t.start()
+        # Surface connection and schema errors here, as a direct connect would
+        ready.result()
+
+    def _loop(self, db_path, ready):
+        """Own the SQLite connection and execute queued statements in order"""
+        # Autocommit mode; each work item runs in an explicit transaction
+        try:
+            conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=256)
+            cursor = conn.cursor()
+            cursor.executescript('''
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-8000;
+            ''')
+            self._create_tables(cursor)
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            statements, future = item
+            try:
+                cursor.execute('BEGIN')
+                try:
+                    for sql, params, many in statements:
+                        if many:
+                            cursor.executemany(sql, params)
+                        else:
+                            cursor.execute(sql, params)
+                    rows = cursor.fetchall()
+                except BaseException:
+                    cursor.execute('ROLLBACK')
+                    raise
+                cursor.execute('COMMIT')
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(rows)
+        conn.close()
+
+    def _submit(self, *statements):
+        """Queue (sql, params, many) statements as one transaction"""
+        future = Future()
+        self._q.put((statements, future))
+        return future
 
-    def _create_tables(self):
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._q.put(None)
+        self._t.join()
+
+    @staticmethod
+    def _create_tables(cursor):
         """Create necessary database tables"""
         # Questions table to store generated questions
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS questions (
                 id INTEGER PRIMARY KEY,
                 question TEXT UNIQUE,
@@ -28,8 +134,18 @@ class TriviaQuizDatabase:
             )
         ''')
         
+        # Partial indexes backing the challenging questions lookup
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_q_attempts 
+            ON questions(total_attempts) WHERE total_attempts > 0
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_q_ratio 
+            ON questions((correct_attempts * 1.0 / total_attempts)) WHERE total_attempts > 0
+        ''')
+        
         # Quiz history table
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS quiz_history (
                 id INTEGER PRIMARY KEY,
                 date DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -37,86 +153,119 @@ class TriviaQuizDatabase:
                 correct_questions INTEGER,
                 source_file TEXT
             )
-        ''`)
-        self.conn.commit()
+        ''')
 
     def insert_or_update_question(self, question, source_file):
         """Insert or update question in the database"""
-        try:
-            self.cursor.execute('''
-                INSERT OR IGNORE INTO questions 
-                (question, source_file) VALUES (?, ?)
-            ''', (question, source_file))
-            self.conn.commit()
-        except sqlite3.IntegrityError:
-            print(f"Question already exists: {question}")
+        return self._submit((_SQL_INSERT_Q, (question, source_file), False))
+
+    def insert_or_update_questions(self, pairs):
+        """Insert (question, source_file) pairs in a single transaction"""
+        return self._submit((_SQL_INSERT_Q, pairs, True))
 
     def record_quiz_result(self, total_questions, correct_questions, source_file):
         """Record quiz result in history"""
-        self.cursor.execute('''
-            INSERT INTO quiz_history 
-            (total_questions, correct_questions, source_file) 
-            VALUES (?, ?, ?)
-        ''', (total_questions, correct_questions, source_file))
-        self.conn.commit()
+        self._chal_cache = (0.0, None, None)
+        return self._submit((_SQL_INSERT_HISTORY, (total_questions, correct_questions, source_file), False))
 
     def update_question_stats(self, question, is_correct):
         """Update question statistics"""
-        self.cursor.execute('''
-            UPDATE questions 
-            SET total_attempts = total_attempts + 1,
-                correct_attempts = correct_attempts + ?
-            WHERE question = ?
-        ''', (1 if is_correct else 0, question))
-        self.conn.commit()
+        self._chal_cache = (0.0, None, None)
+        return self._submit((_SQL_UPDATE_STATS, (1 if is_correct else 0, question), False))
+
+    def record_quiz_submission(self, updates, total_questions, correct_questions, source_file):
+        """Update question statistics and record quiz result in a single transaction"""
+        self._chal_cache = (0.0, None, None)
+        return self._submit((_SQL_UPDATE_STATS, updates, True),
+                            (_SQL_INSERT_HISTORY, (total_questions, correct_questions, source_file), False))
 
     def get_challenging_questions(self, limit=5):
         """Retrieve questions with lowest correct rate"""
-        self.cursor.execute('''
-            SELECT question FROM questions 
-            WHERE total_attempts > 0
-            ORDER BY (correct_attempts * 1.0 / total_attempts) ASC
-            LIMIT ?
-        ''', (limit,))
-        return [row[0] for row in self.cursor.fetchall()]
+        ts, cached_limit, cached = self._chal_cache
+        if cached_limit == limit and time.monotonic() - ts < _CHALLENGING_TTL:
+            return list(cached)
+        rows = self._submit((_SQL_CHALLENGING, (limit,), False)).result()
+        questions = [row[0] for row in rows]
+        self._chal_cache = (time.monotonic(), limit, questions)
+        return list(questions)
 
 class QuestionGenerator:
     @staticmethod
     def generate_trivia_questions(file_path):
         """Generate trivia questions from a text file"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Basic question generation strategies
-        questions = []
+        # Basic question generation strategies: "What", "Why" and "How"
+        # questions, built in a single pass over the extracted sentences.
+        # Keys of an insertion-ordered dict double as the de-duplicated result.
+        questions = {}
+        what_count = why_count = how_count = full = 0
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return []
+            # Stream matches from the mapped file; only decode long-enough matches
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                for match in _SENT_RE_B.finditer(content):
+                    start, end = match.span()
+                    if end - start < _MIN_SENT_LEN:
+                        continue
+                    raw = content[start:end]
+                    sentence = raw.decode('utf-8', 'ignore')
+                    # Bounded split: only the first six words matter for the gates
+                    word_count = len(sentence.split(None, 5))
+                    if word_count <= 4:
+                        continue
+                    if what_count < _MAX_PER_TYPE:
+                        questions["What " + sentence + "?"] = None
+                        what_count += 1
+                        full += what_count == _MAX_PER_TYPE
+                    if word_count > 5:
+                        if why_count < _MAX_PER_TYPE:
+                            questions["Why is " + sentence + "?"] = None
+                            why_count += 1
+                            full += why_count == _MAX_PER_TYPE
+                        if how_count < _MAX_PER_TYPE:
+                            questions["How does " + sentence + "?"] = None
+                            how_count += 1
+                            full += how_count == _MAX_PER_TYPE
+                    # Nothing left to collect once every type is at its cap
+                    if full == 3:
+                        break
         
-        # Generate "What" questions
-        what_questions = [
-            f"What {sentence}?" 
-            for sentence in re.findall(r'[A-Z][^.!?]*', content) 
-            if len(sentence.split()) > 4
-        ][:10]
-        questions.extend(what_questions)
-        
-        # Generate "Why" questions
-        why_questions = [
-            f"Why is {sentence}?" 
-            for sentence in re.findall(r'[A-Z][^.!?]*', content) 
-            if len(sentence.split()) > 5
-        ][:10]
-        questions.extend(why_questions)
-        
-        # Generate "How" questions
-        how_questions = [
-            f"How does {sentence}?" 
-            for sentence in re.findall(r'[A-Z][^.!?]*', content) 
-            if len(sentence.split()) > 5
-        ][:10]
-        questions.extend(how_questions)
-        
-        return list(set(questions))  # Remove duplicates
+        return list(questions)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _gen_cached(file_path, mtime_ns, size):
+        """Memoized question generation, keyed on the file's stat signature"""
+        return tuple(QuestionGenerator.generate_trivia_questions(file_path))
+
+class GenWorkerSignals(QObject):
+    """Signals emitted by GenWorker back to the UI thread"""
+    done = pyqtSignal(str, list)
+    failed = pyqtSignal(str)
+
+class GenWorker(QRunnable):
+    def __init__(self, file_path):
+        """Generate questions for file_path on a thread pool worker"""
+        super().__init__()
+        self.file_path = file_path
+        self.signals = GenWorkerSignals()
+
+    def run(self):
+        """Read and parse the source file off the UI thread"""
+        try:
+            # Reused while the source file is unchanged
+            st = os.stat(self.file_path)
+            questions = QuestionGenerator._gen_cached(self.file_path, st.st_mtime_ns, st.st_size)
+        except Exception as e:
+            # Always report back so the UI can re-enable generation
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.done.emit(self.file_path, list(questions))
 
 class TriviaQuizApp(QMainWindow):
+    # Emitted from the database writer thread when a queued write fails
+    write_failed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Trivia Quiz Generator")
@@ -126,6 +275,7 @@ class TriviaQuizApp(QMainWindow):
         self.current_questions = []
         self.current_answers = {}
         self.current_source_file = None
+        self.write_failed.connect(self._on_write_failed)
         
         self.init_ui()
     
@@ -152,8 +302,8 @@ class TriviaQuizApp(QMainWindow):
         question_count_layout.addWidget(self.question_count_spinbox)
         
         # Generate Quiz Button
-        generate_quiz_btn = QPushButton("Generate Quiz")
-        generate_quiz_btn.clicked.connect(self.generate_quiz)
+        self.generate_quiz_btn = QPushButton("Generate Quiz")
+        self.generate_quiz_btn.clicked.connect(self.generate_quiz)
         
         # Question Display Area
         self.question_display = QTextEdit()
@@ -174,7 +324,7 @@ class TriviaQuizApp(QMainWindow):
         # Add Widgets to Layout
         main_layout.addLayout(file_layout)
         main_layout.addLayout(question_count_layout)
-        main_layout.addWidget(generate_quiz_btn)
+        main_layout.addWidget(self.generate_quiz_btn)
         main_layout.addWidget(QLabel("Quiz Questions:"))
         main_layout.addWidget(self.question_display)
         main_layout.addWidget(QLabel("Your Answers:"))
@@ -198,28 +348,61 @@ class TriviaQuizApp(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select a source file first!")
             return
         
+        # Generate questions in the background to keep the UI responsive
+        worker = GenWorker(self.current_source_file)
+        worker.signals.done.connect(self._on_generated)
+        worker.signals.failed.connect(self._on_generate_failed)
+        self.generate_quiz_btn.setEnabled(False)
+        QThreadPool.globalInstance().start(worker)
+    
+    def _on_generated(self, file_path, questions):
+        """Sample, display and store questions produced by GenWorker"""
+        self.generate_quiz_btn.setEnabled(True)
+        # Drop results for a file that was replaced while generating
+        if file_path != self.current_source_file:
+            return
         num_questions = self.question_count_spinbox.value()
         
-        # Generate questions
-        questions = QuestionGenerator.generate_trivia_questions(self.current_source_file)
-        
         # Randomly select questions
-        self.current_questions = random.sample(questions, min(num_questions, len(questions)))
+        idxs = _rng.sample(range(len(questions)), min(num_questions, len(questions)))
+        self.current_questions = [questions[i] for i in idxs]
         
         # Display questions
         self.question_display.setText("\n\n".join(self.current_questions))
         
         # Store questions in database
-        for question in self.current_questions:
-            self.database.insert_or_update_question(question, self.current_source_file)
+        pairs = [(question, self.current_source_file) for question in self.current_questions]
+        self._watch_write(self.database.insert_or_update_questions(pairs))
+    
+    def _on_generate_failed(self, message):
+        """Report a source file that could not be read"""
+        self.generate_quiz_btn.setEnabled(True)
+        QMessageBox.warning(self, "Error", f"Could not read source file: {message}")
+    
+    def _watch_write(self, future):
+        """Report a queued database write if it fails"""
+        future.add_done_callback(self._check_write)
+    
+    def _check_write(self, future):
+        """Forward a write failure to the UI thread (runs on the writer thread)"""
+        error = future.exception()
+        if error is not None:
+            self.write_failed.emit(str(error))
+    
+    def _on_write_failed(self, message):
+        """Report a database write that was rolled back"""
+        QMessageBox.warning(self, "Database Error", f"Could not save quiz data: {message}")
     
     def submit_answers(self):
         """Process submitted answers"""
-        user_answers = self.answer_input.toPlainText().split('\n')
+        # Only materialize as many answer lines as there are questions
+        num_questions = len(self.current_questions)
+        user_answers = self.answer_input.toPlainText().split('\n', num_questions)[:num_questions]
         
         # Basic scoring (placeholder - could be enhanced with NLP)
         correct_count = 0
         
+        updates = []
         result_text = "Quiz Results:\n"
         for i, (question, user_answer) in enumerate(zip(self.current_questions, user_answers), 1):
             is_correct = len(user_answer.strip()) > 0  # Placeholder logic
@@ -227,13 +410,13 @@ class TriviaQuizApp(QMainWindow):
             if is_correct:
                 correct_count += 1
             
-            # Update question statistics in database
-            self.database.update_question_stats(question, is_correct)
+            updates.append((1 if is_correct else 0, question))
             
             result_text += f"{i}. {question}\nYour Answer: {user_answer}\n{'Correct' if is_correct else 'Incorrect'}\n\n"
         
-        # Record quiz result
-        self.database.record_quiz_result(len(self.current_questions), correct_count, self.current_source_file)
+        # Update question statistics and record quiz result in database
+        self._watch_write(self.database.record_quiz_submission(updates, len(self.current_questions), 
+                                                               correct_count, self.current_source_file))
         
         # Show results
         QMessageBox.information(self, "Quiz Results", 
@@ -249,15 +432,22 @@ class TriviaQuizApp(QMainWindow):
         
         challenge_dialog = QDialog(self)
         challenge_dialog.setWindowTitle("Challenging Questions")
+        challenge_dialog.setUpdatesEnabled(False)
         challenge_layout = QVBoxLayout()
         
-        for question in challenging_questions:
-            label = QLabel(question)
-            label.setWordWrap(True)
-            challenge_layout.addWidget(label)
+        # One label for all questions avoids a layout pass per widget
+        label = QLabel("\n\n".join(challenging_questions))
+        label.setWordWrap(True)
+        challenge_layout.addWidget(label)
         
         challenge_dialog.setLayout(challenge_layout)
+        challenge_dialog.setUpdatesEnabled(True)
         challenge_dialog.exec_()
+    
+    def closeEvent(self, event):
+        """Flush pending database writes before the window closes"""
+        self.database.close()
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)